@@ -301,14 +301,14 @@ SELECT OBJECT_CONSTRUCT(
         'email', c.email,
         'tier', c.customer_tier,
         'total_spent', c.total_spent,
-        'total_orders', COALESCE(order_count.cnt, 0),
-        'avg_order_value', COALESCE(c.total_spent / NULLIF(order_count.cnt, 0), 0),
+        'total_orders', COALESCE(order_stats.cnt, 0),
+        'avg_order_value', COALESCE(c.total_spent / NULLIF(order_stats.cnt, 0), 0),
         'account_age_days', DATEDIFF(day, c.account_created_date, CURRENT_DATE()),
         'lifetime_value', c.total_spent * 1.2
     ),
     'recent_activity', ARRAY_CONSTRUCT(
         'Viewed ' || COALESCE(recent_events.event_count, 0) || ' products this month',
-        'Last purchase: ' || COALESCE(TO_VARCHAR(last_order.order_date), 'Never'),
+        'Last purchase: ' || COALESCE(TO_VARCHAR(order_stats.last_order_date), 'Never'),
         'Preferred contact: ' || c.preferred_contact_method
     ),
     'preferences', OBJECT_CONSTRUCT(
@@ -318,20 +318,21 @@ SELECT OBJECT_CONSTRUCT(
     ),
     'next_best_actions', ARRAY_COMPACT(ARRAY_CONSTRUCT(
         CASE WHEN c.churn_risk_score > 0.5 THEN 'Schedule retention call' END,
-        CASE WHEN order_count.cnt = 0 THEN 'Send welcome offer' END,
-        CASE WHEN DATEDIFF(day, last_order.order_date, CURRENT_DATE()) > 365 THEN 'Re-engagement campaign' END,
+        CASE WHEN order_stats.cnt = 0 THEN 'Send welcome offer' END,
+        CASE WHEN DATEDIFF(day, order_stats.last_order_date, CURRENT_DATE()) > 365 THEN 'Re-engagement campaign' END,
         'Personalized product recommendations',
         'VIP tier upgrade consideration'
     ))
 )
 FROM RETAIL_WATCH_DB.PUBLIC.customers c
 LEFT JOIN (
-    SELECT customer_id, COUNT(*) as cnt
+    -- Order count and last order date in a single pass over orders
+    SELECT customer_id, COUNT(*) as cnt, MAX(order_date) as last_order_date
     FROM RETAIL_WATCH_DB.PUBLIC.orders 
     WHERE customer_id = input_customer_id
     GROUP BY customer_id
     LIMIT 1
-) order_count ON c.customer_id = order_count.customer_id
+) order_stats ON c.customer_id = order_stats.customer_id
 LEFT JOIN (
     SELECT customer_id, COUNT(*) as event_count
     FROM RETAIL_WATCH_DB.PUBLIC.customer_events 
@@ -339,13 +340,6 @@ LEFT JOIN (
     GROUP BY customer_id
     LIMIT 1
 ) recent_events ON c.customer_id = recent_events.customer_id
-LEFT JOIN (
-    SELECT customer_id, MAX(order_date) as order_date
-    FROM RETAIL_WATCH_DB.PUBLIC.orders 
-    WHERE customer_id = input_customer_id
-    GROUP BY customer_id
-    LIMIT 1
-) last_order ON c.customer_id = last_order.customer_id
 WHERE c.customer_id = input_customer_id
 LIMIT 1
 $$;
@@ -507,8 +501,8 @@ SELECT OBJECT_CONSTRUCT(
     END,
     'price_insights', ARRAY_CONSTRUCT(
         CASE 
-            WHEN avg_rating.rating >= 4.5 THEN 'High customer satisfaction supports premium pricing'
-            WHEN avg_rating.rating < 3.5 THEN 'Consider price reduction to improve competitiveness'
+            WHEN price_factor.rating >= 4.5 THEN 'High customer satisfaction supports premium pricing'
+            WHEN price_factor.rating < 3.5 THEN 'Consider price reduction to improve competitiveness'
             ELSE 'Current pricing aligns with customer feedback'
         END,
         CASE 
@@ -523,29 +517,19 @@ SELECT OBJECT_CONSTRUCT(
     'analysis_date', CURRENT_DATE()
 )
 FROM RETAIL_WATCH_DB.PUBLIC.products p
-LEFT JOIN (
-    SELECT product_id, AVG(rating) as rating
-    FROM RETAIL_WATCH_DB.PUBLIC.product_reviews 
-    WHERE product_id = input_product_id
-    GROUP BY product_id
-    LIMIT 1
-) avg_rating ON p.product_id = avg_rating.product_id
 CROSS JOIN (
+    -- Average rating and the price factor derived from it in a single pass over the reviews
+    -- (an ungrouped aggregate always yields one row, with a NULL rating when there are no reviews)
     SELECT 
+        AVG(rating) as rating,
         CASE 
-            WHEN COALESCE(avg_rating.rating, 4.0) >= 4.5 THEN 1.05
-            WHEN COALESCE(avg_rating.rating, 4.0) < 3.5 THEN 0.95
+            WHEN COALESCE(AVG(rating), 4.0) >= 4.5 THEN 1.05
+            WHEN COALESCE(AVG(rating), 4.0) < 3.5 THEN 0.95
             ELSE 1.00
         END as factor,
         0.82 as confidence
-    FROM (SELECT 1) dummy
-    LEFT JOIN (
-        SELECT AVG(rating) as rating
-        FROM RETAIL_WATCH_DB.PUBLIC.product_reviews 
-        WHERE product_id = input_product_id
-        LIMIT 1
-    ) avg_rating ON true
-    LIMIT 1
+    FROM RETAIL_WATCH_DB.PUBLIC.product_reviews 
+    WHERE product_id = input_product_id
 ) price_factor
 WHERE p.product_id = input_product_id
 LIMIT 1
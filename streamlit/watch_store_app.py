@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
 import json
-import plotly.express as px
-import plotly.graph_objects as go
+
+try:
+    import orjson
+    _json_loads = orjson.loads  # C parser, accepts str and bytes
+except ImportError:  # orjson is optional - fall back to the standard library
+    _json_loads = json.loads
 
 # Set page config
 st.set_page_config(
@@ -42,6 +45,14 @@ PRODUCT_IMAGES = {
 # Default fallback image
 DEFAULT_IMAGE = "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=400&h=400&fit=crop&crop=center"
 
+# Welcome screen showcase (product id -> caption)
+FEATURED_PRODUCTS = {
+    'ROLEX_SUB_001': "Rolex Submariner",
+    'OMEGA_SPEED_001': "Omega Speedmaster",
+    'TAG_CARRERA_001': "TAG Heuer Carrera",
+    'APPLE_WATCH_001': "Apple Watch"
+}
+
 def get_product_image(product_id, product_name="", width=200):
     """Get working image URL for any product based on WatchBase.com specifications"""
     # First try exact product ID match
@@ -74,17 +85,63 @@ def get_product_image(product_id, product_name="", width=200):
     # Final fallback
     return DEFAULT_IMAGE
 
+def resolve_product_image(product_id, product_name="", images=None):
+    """Use the first image URL supplied with a product (e.g. by an AI function), else the catalogue lookup"""
+    if images:
+        return images[0]
+    return get_product_image(product_id, product_name)
+
+# Customer tier icons
+TIER_IMAGES = {
+    'Bronze': '🥉',  # Bronze medal
+    'Silver': '🥈',  # Silver medal  
+    'Gold': '🥇',    # Gold medal
+    'Platinum': '💎', # Diamond
+    'Diamond': '💎'   # Diamond
+}
+
 # Customer tier images function
 def get_customer_tier_image(tier):
     """Return appropriate tier image based on customer tier"""
-    tier_images = {
-        'Bronze': '🥉',  # Bronze medal
-        'Silver': '🥈',  # Silver medal  
-        'Gold': '🥇',    # Gold medal
-        'Platinum': '💎', # Diamond
-        'Diamond': '💎'   # Diamond
-    }
-    return tier_images.get(tier, '👤')
+    return TIER_IMAGES.get(tier, '👤')
+
+# Placeholder values the sentiment function can return as key themes
+IGNORED_THEMES = frozenset({'undefined'})
+
+# HTML card templates, filled with str.format at render time
+CUSTOMER_CARD_HTML = """
+<div style="background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
+            padding: 2rem; border-radius: 15px; color: white; margin-bottom: 2rem;">
+    <h1>{tier_icon} {name} - {tier} Tier</h1>
+    <h3>💎 Lifetime Value: ${lifetime_value:,.0f}</h3>
+    <p>📧 {email}</p>
+    <p>🛍️ Total Orders: {total_orders} |
+       💰 Total Spent: ${total_spent:,.0f} |
+       📊 Avg Order: ${avg_order_value:,.0f}</p>
+</div>
+"""
+
+RECOMMENDATION_CARD_HTML = """
+<div style="display: flex; gap: 1.5rem; align-items: flex-start; margin-bottom: 1rem;">
+    <div style="flex: 0 0 200px; text-align: center;">
+        <img src="{image_url}" width="200" style="border-radius: 10px;">
+        <p style="font-size: 0.875rem; color: #808495;">{product_name}</p>
+    </div>
+    <div style="flex: 1; background: white; padding: 1rem; border-radius: 10px; border-left: 4px solid #667eea;">
+        <h3>{product_name}</h3>
+        <p><strong>{brand_name}</strong> | ${price:,.2f}</p>
+        <p>⭐ {rating:.1f}/5.0 ({review_count} reviews)</p>
+        <p><strong>Match Score:</strong> {recommendation_score}/100</p>
+        <p><strong>Why this matches:</strong></p>
+        <ul>{match_reasons}</ul>
+        <p>{description}</p>
+    </div>
+</div>
+"""
+
+# Partial reruns for self-contained pages: st.fragment (Streamlit 1.37+), the experimental
+# name on older runtimes, and a plain full-page rerun where neither exists
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 # Database connection for Streamlit in Snowflake
 @st.cache_resource
@@ -92,14 +149,124 @@ def init_connection():
     conn = st.connection("snowflake")
     return conn
 
-# Helper functions
-@st.cache_data
+# Helper functions - caches are bounded so per-id results cannot grow without limit
+# Reference-data queries (customers, products, reviews) change slowly and are read-only, so they
+# are shared across sessions as one DataFrame instead of being unpickled per call. Do not mutate them.
+# conn.query keeps its own cache, which never expires unless given a ttl, so it gets the same one.
+QUERY_TTL_SECONDS = 900
+
+@st.cache_resource(ttl=QUERY_TTL_SECONDS, max_entries=32)
 def run_query(query, params=None):
     conn = init_connection()
     if params:
-        return conn.query(query, params=params)
+        return conn.query(query, params=params, ttl=QUERY_TTL_SECONDS)
     else:
-        return conn.query(query)
+        return conn.query(query, ttl=QUERY_TTL_SECONDS)
+
+# AI function results depend on live orders, events and reviews (and CURRENT_DATE), so they
+# expire on the same schedule as the reference data rather than living until "Refresh Data"
+@st.cache_data(ttl=QUERY_TTL_SECONDS, max_entries=256)
+def run_row(query, params=None):
+    """Return the first row of a query as a tuple (or None) without building a DataFrame"""
+    conn = init_connection()
+    with conn.cursor() as cur:
+        row = cur.execute(query, params).fetchone()
+    return tuple(row) if row else None
+
+def run_scalar(query, params=None):
+    """Return the first value of a single-row query (e.g. an AI function call), cached through run_row"""
+    row = run_row(query, params)
+    return row[0] if row else None
+
+def parse_ai_response(raw):
+    """Decode an AI function result (the connector returns OBJECT values as JSON strings)"""
+    return _json_loads(raw) if isinstance(raw, str) else raw
+
+# AI functions callable from the app. Each statement text is fixed and the id is bound,
+# so Snowflake sees one statement per function regardless of the argument.
+AI_FUNCTION_STATEMENTS = {
+    name: f"SELECT {name}(?) AS result" for name in (
+        'get_customer_360_insights',
+        'get_personal_recommendations',
+        'predict_customer_churn',
+        'optimize_product_pricing',
+        'analyze_review_sentiment'
+    )
+}
+
+def call_ai_function(function_name, argument):
+    """Call a single-argument AI function with a bound argument and return its decoded result (or None)"""
+    raw = run_scalar(AI_FUNCTION_STATEMENTS[function_name], (argument,))
+    return parse_ai_response(raw) if raw else None
+
+# The per-customer AI functions are evaluated together, so the dashboard, recommendation and
+# churn pages share one Snowflake round trip per customer instead of one each
+CUSTOMER_BUNDLE_FUNCTIONS = {
+    'insights': 'get_customer_360_insights',
+    'recommendations': 'get_personal_recommendations',
+    'churn': 'predict_customer_churn'
+}
+CUSTOMER_BUNDLE_STATEMENT = "SELECT " + ", ".join(
+    f"{name}(?) AS {alias}" for alias, name in CUSTOMER_BUNDLE_FUNCTIONS.items()
+)
+
+def load_customer_bundle(customer_id):
+    """Return the decoded insights, recommendations and churn results for a customer (values may be None)"""
+    row = run_row(CUSTOMER_BUNDLE_STATEMENT, (customer_id,) * len(CUSTOMER_BUNDLE_FUNCTIONS))
+    if not row:
+        return dict.fromkeys(CUSTOMER_BUNDLE_FUNCTIONS)
+    return {alias: parse_ai_response(raw) if raw else None for alias, raw in zip(CUSTOMER_BUNDLE_FUNCTIONS, row)}
+
+def load_customer_result(customer_id, alias):
+    """Return one decoded per-customer AI result ('insights', 'recommendations' or 'churn')"""
+    try:
+        return load_customer_bundle(customer_id)[alias]
+    except Exception:
+        # One failing function fails the whole bundled statement - call this page's function
+        # on its own so only the page whose function is broken shows its fallback
+        return call_ai_function(CUSTOMER_BUNDLE_FUNCTIONS[alias], customer_id)
+
+# Reference-data loaders - re-queried at most every QUERY_TTL_SECONDS (15 minutes), or on "Refresh Data"
+CUSTOMER_LIST_LIMIT = 500
+
+def load_customers(search=""):
+    """Top customers by spend for the sidebar, optionally filtered by name (risk bucketing is computed in Snowflake)"""
+    # Match the search text literally - escape the escape character and the LIKE wildcards
+    pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return run_query(f"""
+        SELECT customer_id, first_name, last_name, customer_tier,
+               CASE WHEN churn_risk_score > 0.7 THEN 'HIGH'
+                    WHEN churn_risk_score > 0.4 THEN 'MEDIUM'
+                    ELSE 'LOW'
+               END AS risk_level
+        FROM RETAIL_WATCH_DB.PUBLIC.customers 
+        WHERE ? = '' OR (first_name || ' ' || last_name) ILIKE '%' || ? || '%' ESCAPE '\\\\'
+        ORDER BY total_spent DESC
+        LIMIT {CUSTOMER_LIST_LIMIT}
+    """, params=(search, pattern))
+
+def load_products():
+    """Active products with brand, most expensive first"""
+    return run_query("""
+        SELECT product_id, product_name, brand_name, current_price, stock_quantity
+        FROM RETAIL_WATCH_DB.PUBLIC.products p
+        JOIN RETAIL_WATCH_DB.PUBLIC.watch_brands b ON p.brand_id = b.brand_id
+        WHERE p.product_status = 'active'
+        ORDER BY p.current_price DESC
+    """)
+
+def load_recent_reviews():
+    """The 50 most recent product reviews with product and brand names"""
+    return run_query("""
+        SELECT pr.review_id, pr.product_id, pr.review_text, pr.rating,
+               TO_VARCHAR(pr.review_date, 'YYYY-MM-DD') AS review_date,
+               p.product_name, b.brand_name
+        FROM RETAIL_WATCH_DB.PUBLIC.product_reviews pr
+        JOIN RETAIL_WATCH_DB.PUBLIC.products p ON pr.product_id = p.product_id
+        JOIN RETAIL_WATCH_DB.PUBLIC.watch_brands b ON p.brand_id = b.brand_id
+        ORDER BY pr.review_date DESC
+        LIMIT 50
+    """)
 
 # Main app
 def main():
@@ -110,27 +277,27 @@ def main():
     # Initialize session state with proper defaults
     if 'current_customer' not in st.session_state:
         st.session_state.current_customer = None
-    if 'previous_customer' not in st.session_state:
-        st.session_state.previous_customer = None
     
     # Sidebar for customer selection
     with st.sidebar:
         st.header("👤 Customer Selection")
         
-        # Get customer list
-        customers = run_query("""
-            SELECT customer_id, first_name, last_name, customer_tier, churn_risk_score
-            FROM RETAIL_WATCH_DB.PUBLIC.customers 
-            ORDER BY total_spent DESC
-        """)
+        # Get customer list - only the top customers are fetched, search reaches the rest
+        search = st.text_input("Search Customer:", key="customer_search", placeholder="First or last name").strip()
+        customers = load_customers(search)
+        if len(customers) == CUSTOMER_LIST_LIMIT:
+            st.caption(f"Showing the top {CUSTOMER_LIST_LIMIT} customers by spend - search to find others.")
         
         customer_options = {}
         if not customers.empty:
-            for _, customer in customers.iterrows():
-                tier_icon = get_customer_tier_image(customer['CUSTOMER_TIER'])
-                risk_level = "HIGH" if customer['CHURN_RISK_SCORE'] > 0.7 else "MEDIUM" if customer['CHURN_RISK_SCORE'] > 0.4 else "LOW"
-                display_name = f"{tier_icon} {customer['FIRST_NAME']} {customer['LAST_NAME']} ({customer['CUSTOMER_TIER']}) - {risk_level} RISK"
-                customer_options[display_name] = customer['CUSTOMER_ID']
+            # Categorical tiers: icon lookup and string conversion run once per tier, not per row
+            tiers = customers['CUSTOMER_TIER'].astype('category')
+            tier_icons = tiers.map(get_customer_tier_image).astype(str)
+            display_names = (
+                tier_icons + ' ' + customers['FIRST_NAME'] + ' ' + customers['LAST_NAME']
+                + ' (' + tiers.astype(str) + ') - ' + customers['RISK_LEVEL'] + ' RISK'
+            )
+            customer_options = dict(zip(display_names, customers['CUSTOMER_ID']))
         
         # Customer selection with change detection
         selected_customer_display = st.selectbox(
@@ -139,25 +306,22 @@ def main():
             key="customer_selector"
         )
         
-        # Check if customer changed and force refresh
+        # Check if customer changed
         if selected_customer_display and customer_options and selected_customer_display != "No customers available":
             new_customer_id = customer_options[selected_customer_display]
             
-            # If customer changed, clear cache and update session state
+            # If customer changed, update session state. AI results are cached per bound
+            # customer id in run_row (expiring after QUERY_TTL_SECONDS), so switching back
+            # to a customer does not need a cache clear.
             if st.session_state.current_customer != new_customer_id:
-                st.session_state.previous_customer = st.session_state.current_customer
                 st.session_state.current_customer = new_customer_id
-                # Clear cached data when customer changes
-                st.cache_data.clear()
-                # Force rerun to refresh all content
-                if st.session_state.previous_customer is not None:
-                    st.rerun()
         
         # Quick actions with cache clearing
         st.markdown("---")
         st.header("⚡ Quick Actions")
         if st.button("🔄 Refresh Data", key="refresh_data"):
             st.cache_data.clear()
+            run_query.clear()
             st.success("Data refreshed!")
             st.rerun()
             
@@ -173,53 +337,49 @@ def main():
     
     # Main content area
     if st.session_state.current_customer:
-        # Navigation tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "🏠 Customer Dashboard",
-            "🎯 Personal Recommendations", 
-            "⚠️ Churn Analysis",
-            "💰 Price Optimization",
-            "📊 Sentiment Analysis"
-        ])
+        # Page navigation - unlike st.tabs, only the selected page is executed on each run
+        page = st.radio(
+            "Navigation",
+            [
+                "🏠 Customer Dashboard",
+                "🎯 Personal Recommendations", 
+                "⚠️ Churn Analysis",
+                "💰 Price Optimization",
+                "📊 Sentiment Analysis"
+            ],
+            horizontal=True,
+            label_visibility="collapsed",
+            key="page_selector"
+        )
         
-        with tab1:
+        if page == "🏠 Customer Dashboard":
             display_customer_dashboard()
-        with tab2:
+        elif page == "🎯 Personal Recommendations":
             display_personal_recommendations(st.session_state.current_customer)
-        with tab3:
+        elif page == "⚠️ Churn Analysis":
             display_churn_analysis(st.session_state.current_customer)
-        with tab4:
+        elif page == "💰 Price Optimization":
             display_price_optimization()
-        with tab5:
+        elif page == "📊 Sentiment Analysis":
             display_sentiment_analysis()
     else:
         # Welcome screen with watch brand showcase
         st.info("👆 Please select a customer from the sidebar to begin exploring their personalized watch journey.")
         
         st.markdown("### 🌟 Featured Watch Brands from WatchBase.com")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.image(PRODUCT_IMAGES['ROLEX_SUB_001'], width=150, caption="Rolex Submariner")
-        with col2:
-            st.image(PRODUCT_IMAGES['OMEGA_SPEED_001'], width=150, caption="Omega Speedmaster")
-        with col3:
-            st.image(PRODUCT_IMAGES['TAG_CARRERA_001'], width=150, caption="TAG Heuer Carrera")
-        with col4:
-            st.image(PRODUCT_IMAGES['APPLE_WATCH_001'], width=150, caption="Apple Watch")
+        # A single st.image call renders the whole showcase row
+        st.image(
+            [PRODUCT_IMAGES[product_id] for product_id in FEATURED_PRODUCTS],
+            width=150,
+            caption=list(FEATURED_PRODUCTS.values())
+        )
 
 def display_customer_dashboard():
     customer_id = st.session_state.current_customer
     
     # Get customer insights (simplified version without risk_assessment)
     try:
-        insights_query = f"SELECT get_customer_360_insights('{customer_id}') as insights"
-        insights_result = run_query(insights_query)
-        
-        if not insights_result.empty:
-            insights = json.loads(insights_result.iloc[0]['INSIGHTS'])
-        else:
-            insights = None
+        insights = load_customer_result(customer_id, 'insights')
     except Exception as e:
         st.warning("⚠️ AI insights temporarily unavailable. Showing basic customer information.")
         insights = None
@@ -227,20 +387,22 @@ def display_customer_dashboard():
     # Display customer overview with tier icon
     if insights:
         customer_overview = insights.get('customer_overview', {})
+        # Fields shown both in the card and in the metrics are read once
         tier = customer_overview.get('tier', 'Bronze')
         tier_icon = get_customer_tier_image(tier)
+        total_orders = customer_overview.get('total_orders', 0)
+        avg_order_value = customer_overview.get('avg_order_value', 0)
         
-        st.markdown(f"""
-        <div style="background: linear-gradient(90deg, #667eea 0%, #764ba2 100%); 
-                    padding: 2rem; border-radius: 15px; color: white; margin-bottom: 2rem;">
-            <h1>{tier_icon} {customer_overview.get('name', 'Customer')} - {tier} Tier</h1>
-            <h3>💎 Lifetime Value: ${customer_overview.get('lifetime_value', 0):,.0f}</h3>
-            <p>📧 {customer_overview.get('email', 'N/A')}</p>
-            <p>🛍️ Total Orders: {customer_overview.get('total_orders', 0)} | 
-               💰 Total Spent: ${customer_overview.get('total_spent', 0):,.0f} | 
-               📊 Avg Order: ${customer_overview.get('avg_order_value', 0):,.0f}</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(CUSTOMER_CARD_HTML.format(
+            tier_icon=tier_icon,
+            name=customer_overview.get('name', 'Customer'),
+            tier=tier,
+            lifetime_value=customer_overview.get('lifetime_value', 0),
+            email=customer_overview.get('email', 'N/A'),
+            total_orders=total_orders,
+            total_spent=customer_overview.get('total_spent', 0),
+            avg_order_value=avg_order_value
+        ), unsafe_allow_html=True)
         
         # Display other metrics
         col1, col2, col3 = st.columns(3)
@@ -248,28 +410,23 @@ def display_customer_dashboard():
         with col1:
             st.metric("Account Age", f"{customer_overview.get('account_age_days', 0)} days")
         with col2:
-            st.metric("Total Orders", customer_overview.get('total_orders', 0))
+            st.metric("Total Orders", total_orders)
         with col3:
-            st.metric("Average Order", f"${customer_overview.get('avg_order_value', 0):,.0f}")
+            st.metric("Average Order", f"${avg_order_value:,.0f}")
             
         # Display recent activity
         st.subheader("📈 Recent Activity")
         recent_activity = insights.get('recent_activity', [])
-        for activity in recent_activity:
-            st.info(f"• {activity}")
+        if recent_activity:
+            st.info("\n\n".join(f"• {activity}" for activity in recent_activity))
 
+@fragment
 def display_personal_recommendations(customer_id):
     st.header("🎯 Personal Recommendations")
     
     # Get AI recommendations with error handling
     try:
-        recommendations_query = f"SELECT get_personal_recommendations('{customer_id}') as recommendations"
-        rec_result = run_query(recommendations_query)
-        
-        if not rec_result.empty:
-            recommendations = json.loads(rec_result.iloc[0]['RECOMMENDATIONS'])
-        else:
-            recommendations = None
+        recommendations = load_customer_result(customer_id, 'recommendations')
     except Exception as e:
         st.warning("⚠️ AI recommendations temporarily unavailable. Showing popular products.")
         recommendations = None
@@ -289,50 +446,47 @@ def display_personal_recommendations(customer_id):
         # Display recommendations with WatchBase.com-accurate images
         top_recs = recommendations['top_recommendations']
         
-        for i, rec in enumerate(top_recs):
-            col1, col2 = st.columns([1, 3])
+        # All cards go out in one markdown element instead of columns/image/markdown/button per item
+        cards = []
+        for rec in top_recs:
+            product_name = rec['product_name']
+            image_url = resolve_product_image(rec.get('product_id', ''), product_name, rec.get('images'))
             
+            cards.append(RECOMMENDATION_CARD_HTML.format(
+                image_url=image_url,
+                product_name=product_name,
+                brand_name=rec['brand_name'],
+                price=rec['price'],
+                rating=rec['rating'],
+                review_count=rec['review_count'],
+                recommendation_score=rec['recommendation_score'],
+                match_reasons=''.join(f'<li>{reason}</li>' for reason in rec.get('match_reasons', []) if reason),
+                description=rec['description']
+            ))
+        st.markdown("".join(cards), unsafe_allow_html=True)
+        
+        # One cart control for the whole list
+        if top_recs:
+            col1, col2 = st.columns([3, 1])
             with col1:
-                # Use image URLs directly from AI function recommendations
-                images_from_ai = rec.get('images', [])
-                if images_from_ai and len(images_from_ai) > 0:
-                    image_url = images_from_ai[0]  # Get first image from AI function
-                else:
-                    # Fallback to hardcoded images if AI function doesn't provide images
-                    product_id = rec.get('product_id', '')
-                    product_name = rec.get('product_name', '')
-                    image_url = get_product_image(product_id, product_name, width=200)
-                
-                st.image(image_url, width=200, caption=rec['product_name'])
-            
+                cart_product = st.selectbox(
+                    "Product:",
+                    [rec['product_name'] for rec in top_recs],
+                    key="add_cart_product",
+                    label_visibility="collapsed"
+                )
             with col2:
-                match_reasons = [reason for reason in rec.get('match_reasons', []) if reason]
-                
-                st.markdown(f"""
-                <div style="background: white; padding: 1rem; border-radius: 10px; border-left: 4px solid #667eea;">
-                    <h3>{rec['product_name']}</h3>
-                    <p><strong>{rec['brand_name']}</strong> | ${rec['price']:,.2f}</p>
-                    <p>⭐ {rec['rating']:.1f}/5.0 ({rec['review_count']} reviews)</p>
-                    <p><strong>Match Score:</strong> {rec['recommendation_score']}/100</p>
-                    <p><strong>Why this matches:</strong></p>
-                    <ul>{''.join([f'<li>{reason}</li>' for reason in match_reasons])}</ul>
-                    <p>{rec['description']}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if st.button(f"🛒 Add to Cart", key=f"add_cart_{i}"):
-                    st.success(f"Added {rec['product_name']} to cart!")
+                if st.button("🛒 Add to Cart", key="add_cart"):
+                    st.success(f"Added {cart_product} to cart!")
 
 def display_churn_analysis(customer_id):
     st.header("⚠️ Churn Risk Analysis")
     
     # Get churn prediction with error handling
     try:
-        churn_query = f"SELECT predict_customer_churn('{customer_id}') as churn_data"
-        churn_result = run_query(churn_query)
+        churn_data = load_customer_result(customer_id, 'churn')
         
-        if not churn_result.empty:
-            churn_data = json.loads(churn_result.iloc[0]['CHURN_DATA'])
+        if churn_data:
             analysis = churn_data['churn_analysis']
         else:
             analysis = None
@@ -357,36 +511,32 @@ def display_churn_analysis(customer_id):
             st.subheader("🎯 Risk Factors")
             risk_factors = analysis.get('risk_factors', [])
             if risk_factors:
-                for factor in risk_factors:
-                    st.write(f"• {factor}")
+                st.markdown("\n\n".join(f"• {factor}" for factor in risk_factors))
             else:
                 st.success("No significant risk factors identified!")
                 
         # Retention recommendations
         st.subheader("💡 Retention Recommendations")
         retention_recs = analysis.get('retention_recommendations', [])
-        for i, rec in enumerate(retention_recs, 1):
-            st.info(f"{i}. {rec}")
+        if retention_recs:
+            st.info("\n".join(f"{i}. {rec}" for i, rec in enumerate(retention_recs, 1)))
     else:
         st.info("Analysis data not available")
 
+@fragment
 def display_price_optimization():
     st.header("💰 Price Optimization Dashboard")
     
     # Get product list for selection
-    products = run_query("""
-        SELECT product_id, product_name, brand_name, current_price, stock_quantity
-        FROM RETAIL_WATCH_DB.PUBLIC.products p
-        JOIN RETAIL_WATCH_DB.PUBLIC.watch_brands b ON p.brand_id = b.brand_id
-        WHERE p.product_status = 'active'
-        ORDER BY p.current_price DESC
-    """)
+    products = load_products()
     
     product_options = {}
     if not products.empty:
-        for _, product in products.iterrows():
-            display_name = f"{product['PRODUCT_NAME']} ({product['BRAND_NAME']}) - ${product['CURRENT_PRICE']:,.0f}"
-            product_options[display_name] = product['PRODUCT_ID']
+        # Format the whole price column at once instead of an f-string per row
+        prices = products['CURRENT_PRICE'].astype(float).map('${:,.0f}'.format)
+        display_names = products['PRODUCT_NAME'] + ' (' + products['BRAND_NAME'] + ') - ' + prices
+        # Map each label to its row position so the selected row is fetched directly, not by a column scan
+        product_options = dict(zip(display_names, range(len(products))))
     
     selected_product_display = st.selectbox(
         "Select Product for Analysis:",
@@ -395,16 +545,15 @@ def display_price_optimization():
     )
     
     if selected_product_display and product_options and selected_product_display != "No products available":
-        selected_product_id = product_options[selected_product_display]
-        
         # Get selected product details for display
-        selected_product = products[products['PRODUCT_ID'] == selected_product_id].iloc[0]
+        selected_product = products.iloc[product_options[selected_product_display]]
+        selected_product_id = selected_product['PRODUCT_ID']
         
         # Display product image and info with WatchBase.com-accurate image
         col1, col2 = st.columns([1, 2])
         with col1:
             # Get accurate image using WatchBase.com specifications
-            image_url = get_product_image(selected_product_id, selected_product['PRODUCT_NAME'], width=200)
+            image_url = resolve_product_image(selected_product_id, selected_product['PRODUCT_NAME'])
             st.image(image_url, width=200, caption=selected_product['PRODUCT_NAME'])
         
         with col2:
@@ -415,13 +564,9 @@ def display_price_optimization():
         
         # Display price optimization
         st.subheader("📊 Price Analysis")
-        optimization_result = run_query(
-            f"SELECT optimize_product_pricing('{selected_product_id}') as result"
-        )
+        result = call_ai_function('optimize_product_pricing', selected_product_id)
         
-        if not optimization_result.empty:
-            result_raw = optimization_result.iloc[0]['RESULT']
-            result = json.loads(result_raw) if isinstance(result_raw, str) else result_raw
+        if result:
             col1, col2, col3 = st.columns(3)
             
             with col1:
@@ -438,29 +583,24 @@ def display_price_optimization():
             # Price elasticity insights
             st.subheader("🎯 Insights")
             price_insights = result.get('price_insights', [])
-            for insight in price_insights:
-                st.info(f"💡 {insight}")
+            if price_insights:
+                st.info("\n\n".join(f"💡 {insight}" for insight in price_insights))
 
+@fragment
 def display_sentiment_analysis():
     st.header("📊 Sentiment Analysis Dashboard")
     
     # Get reviews for analysis
-    reviews = run_query("""
-        SELECT pr.review_id, pr.product_id, pr.review_text, pr.rating, pr.review_date,
-               p.product_name, b.brand_name
-        FROM RETAIL_WATCH_DB.PUBLIC.product_reviews pr
-        JOIN RETAIL_WATCH_DB.PUBLIC.products p ON pr.product_id = p.product_id
-        JOIN RETAIL_WATCH_DB.PUBLIC.watch_brands b ON p.brand_id = b.brand_id
-        ORDER BY pr.review_date DESC
-        LIMIT 50
-    """)
+    reviews = load_recent_reviews()
     
     if not reviews.empty:
         # Review selection
-        review_options = {}
-        for _, review in reviews.iterrows():
-            display_text = f"{review['PRODUCT_NAME']} - Rating: {review['RATING']}⭐ - {review['REVIEW_TEXT'][:50]}..."
-            review_options[display_text] = review['REVIEW_ID']
+        # Build labels column-wise instead of materializing a Series per row
+        display_texts = (
+            reviews['PRODUCT_NAME'] + ' - Rating: ' + reviews['RATING'].astype(str)
+            + '⭐ - ' + reviews['REVIEW_TEXT'].str.slice(0, 50) + '...'
+        )
+        review_options = dict(zip(display_texts, range(len(reviews))))  # label -> row position
         
         selected_review_display = st.selectbox(
             "Select Review for Analysis:",
@@ -468,8 +608,8 @@ def display_sentiment_analysis():
         )
         
         if selected_review_display:
-            selected_review_id = review_options[selected_review_display]
-            selected_review = reviews[reviews['REVIEW_ID'] == selected_review_id].iloc[0]
+            selected_review = reviews.iloc[review_options[selected_review_display]]
+            selected_review_id = selected_review['REVIEW_ID']
             
             # Display review context with WatchBase.com-accurate image
             col1, col2 = st.columns([1, 3])
@@ -477,20 +617,15 @@ def display_sentiment_analysis():
                 # Get accurate image using WatchBase.com specifications
                 product_id = selected_review['PRODUCT_ID']
                 product_name = selected_review['PRODUCT_NAME']
-                image_url = get_product_image(product_id, product_name, width=150)
+                image_url = resolve_product_image(product_id, product_name)
                 st.image(image_url, width=150, caption=selected_review['PRODUCT_NAME'])
             
             with col2:
                 st.subheader(f"{selected_review['PRODUCT_NAME']}")
                 st.write(f"**Brand:** {selected_review['BRAND_NAME']}")
                 st.write(f"**Rating:** {selected_review['RATING']}⭐")
-                # Safe date formatting
-                review_date = selected_review['REVIEW_DATE']
-                if hasattr(review_date, 'year'):
-                    date_str = f"{review_date.year}-{review_date.month:02d}-{review_date.day:02d}"
-                else:
-                    date_str = str(review_date)[:10]
-                st.write(f"**Review Date:** {date_str}")
+                # Date is formatted by Snowflake in the reviews query
+                st.write(f"**Review Date:** {selected_review['REVIEW_DATE']}")
             
             # Display review
             st.subheader("📝 Review Text")
@@ -498,14 +633,9 @@ def display_sentiment_analysis():
             
             # Sentiment analysis (NO SCORE - as requested)
             st.subheader("📊 Sentiment Analysis")
-            sentiment_result = run_query(
-                f"SELECT analyze_review_sentiment('{selected_review_id}') as result"
-            )
+            result = call_ai_function('analyze_review_sentiment', selected_review_id)
             
-            if not sentiment_result.empty:
-                result_raw = sentiment_result.iloc[0]['RESULT']
-                result = json.loads(result_raw) if isinstance(result_raw, str) else result_raw
-                
+            if result:
                 confidence = result.get('confidence', 0)
                 sentiment_label = result.get('sentiment_label', 'Unknown')
                 
@@ -521,7 +651,7 @@ def display_sentiment_analysis():
                 # Key themes
                 if 'key_themes' in result and result['key_themes']:
                     st.subheader("🏷️ Key Themes")
-                    themes = [theme for theme in result['key_themes'] if theme and theme.lower() != 'undefined']
+                    themes = [theme for theme in result['key_themes'] if theme and theme.lower() not in IGNORED_THEMES]
                     if themes:
                         cols = st.columns(min(len(themes), 4))
                         for i, theme in enumerate(themes):